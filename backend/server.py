@@ -1,29 +1,62 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.middleware.gzip import GZipMiddleware
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from cachetools import TTLCache
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import uuid
+import time
+import itertools
 from datetime import datetime, timezone, timedelta
 import secrets
 import hashlib
 from enum import Enum
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+
+# Motor sizes its PyMongo thread executor from this when it is first imported,
+# so it must be set before the imports below. Most queries here are small, so
+# fewer threads means less thread-hop overhead; an explicit env value wins.
+os.environ.setdefault("MOTOR_MAX_WORKERS", str(min(32, (os.cpu_count() or 1) * 2)))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from emergentintegrations.llm.chat import LlmChat, UserMessage  # noqa: E402
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    tz_aware=True,
+    maxPoolSize=50,
+    minPoolSize=10,
+    serverSelectionTimeoutMS=3000,
+    waitQueueTimeoutMS=2000
+)
 db = client[os.environ['DB_NAME']]
 
+# Cache of auth token hash -> Dealer to skip the DB lookup on repeat requests.
+# Process-local; swap for Redis when running multiple workers.
+_token_cache: TTLCache = TTLCache(maxsize=10000, ttl=300)
+
+# Formatted product catalog for the chat system message: (built_at, text)
+CATALOG_CACHE_TTL = 60
+_catalog_cache: Optional[Tuple[float, str]] = None
+
+# Background task that unsets expired OTPs every OTP_CLEANUP_INTERVAL seconds
+OTP_CLEANUP_INTERVAL = 300
+_otp_cleanup_task: Optional[asyncio.Task] = None
+
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -143,7 +176,7 @@ class OrderItem(BaseModel):
     subtotal: float
 
 class Order(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = ConfigDict(extra="ignore", use_enum_values=True, validate_default=True)
     
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     order_number: str
@@ -184,11 +217,36 @@ def generate_token() -> str:
     """Generate a secure token"""
     return secrets.token_urlsafe(32)
 
+def hash_token(token: str) -> str:
+    """Hash an auth token for storage and lookup"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+_order_seq = itertools.count()
+# Random per-process prefix, generated once, so processes don't share a sequence
+_order_prefix = secrets.token_hex(2).upper()
+
 def generate_order_number() -> str:
-    """Generate unique order number"""
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    random_suffix = secrets.token_hex(3).upper()
-    return f"ORD-{timestamp}-{random_suffix}"
+    """Generate order number from a millisecond timestamp, process prefix and counter"""
+    timestamp = int(time.time() * 1000)
+    seq = next(_order_seq) % 1000000
+    return f"ORD-{timestamp:013d}-{_order_prefix}{seq:06d}"
+
+async def get_products_info() -> str:
+    """Get the product catalog section of the chat context, cached briefly"""
+    global _catalog_cache
+    if _catalog_cache and time.monotonic() - _catalog_cache[0] < CATALOG_CACHE_TTL:
+        return _catalog_cache[1]
+    
+    products = await db.products.find(
+        {},
+        {"_id": 0, "name": 1, "price": 1, "packaging": 1, "grade": 1, "stock": 1}
+    ).to_list(100)
+    products_info = "\n".join([
+        f"- {p['name']}: ₹{p['price']} per {p['packaging']} (Grade: {p['grade']}, Stock: {p['stock']})"
+        for p in products
+    ])
+    _catalog_cache = (time.monotonic(), products_info)
+    return products_info
 
 async def get_current_dealer(authorization: Optional[str] = Header(None)) -> Dealer:
     """Dependency to get current authenticated dealer"""
@@ -196,34 +254,44 @@ async def get_current_dealer(authorization: Optional[str] = Header(None)) -> Dea
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     token = authorization.replace('Bearer ', '')
-    dealer_doc = await db.dealers.find_one({"auth_token": token}, {"_id": 0})
+    token_hash = hash_token(token)
+    dealer = _token_cache.get(token_hash)
+    if dealer is not None:
+        return dealer
+    
+    dealer_doc = await db.dealers.find_one(
+        {"auth_token_hash": token_hash},
+        {"_id": 0, "auth_token_hash": 0, "otp": 0, "otp_expires_at": 0}
+    )
     
     if not dealer_doc:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    return Dealer(**dealer_doc)
+    # Only the hash is stored; echo back the bearer the client sent
+    dealer_doc["auth_token"] = token
+    dealer = Dealer(**dealer_doc)
+    _token_cache[token_hash] = dealer
+    return dealer
 
 # ============= AUTHENTICATION ROUTES =============
 
 @api_router.post("/auth/register", response_model=Dealer)
 async def register_dealer(dealer_data: DealerCreate):
     """Register a new dealer"""
-    # Check if phone already exists
-    existing = await db.dealers.find_one({"phone": dealer_data.phone})
-    if existing:
-        raise HTTPException(status_code=400, detail="Phone number already registered")
-    
     dealer = Dealer(**dealer_data.model_dump())
-    doc = dealer.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
+    doc = dealer.model_dump(exclude={"auth_token", "otp", "otp_expires_at"})
     
-    await db.dealers.insert_one(doc)
+    # The unique phone index rejects duplicates, including concurrent ones
+    try:
+        await db.dealers.insert_one(doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Phone number already registered")
     return dealer
 
 @api_router.post("/auth/send-otp")
 async def send_otp(request: SendOTPRequest):
     """Send OTP to dealer's phone"""
-    dealer_doc = await db.dealers.find_one({"phone": request.phone}, {"_id": 0})
+    dealer_doc = await db.dealers.find_one({"phone": request.phone}, {"_id": 1})
     
     if not dealer_doc:
         raise HTTPException(status_code=404, detail="Phone number not registered")
@@ -236,7 +304,7 @@ async def send_otp(request: SendOTPRequest):
         {"phone": request.phone},
         {"$set": {
             "otp": otp,
-            "otp_expires_at": otp_expires_at.isoformat()
+            "otp_expires_at": otp_expires_at
         }}
     )
     
@@ -249,36 +317,34 @@ async def send_otp(request: SendOTPRequest):
 @api_router.post("/auth/verify-otp", response_model=AuthResponse)
 async def verify_otp(request: VerifyOTPRequest):
     """Verify OTP and login"""
-    dealer_doc = await db.dealers.find_one({"phone": request.phone}, {"_id": 0})
+    # Match phone, OTP and expiry in one indexed query
+    dealer_doc = await db.dealers.find_one(
+        {
+            "phone": request.phone,
+            "otp": request.otp,
+            "otp_expires_at": {"$gt": datetime.now(timezone.utc)}
+        },
+        {"_id": 0}
+    )
     
     if not dealer_doc:
-        raise HTTPException(status_code=404, detail="Phone number not registered")
-    
-    # Check OTP
-    if dealer_doc.get("otp") != request.otp:
-        raise HTTPException(status_code=400, detail="Invalid OTP")
-    
-    # Check OTP expiry
-    otp_expires_at = datetime.fromisoformat(dealer_doc["otp_expires_at"])
-    if datetime.now(timezone.utc) > otp_expires_at:
-        raise HTTPException(status_code=400, detail="OTP expired")
+        raise HTTPException(status_code=400, detail="Invalid or expired OTP")
     
-    # Generate auth token
+    # Generate auth token, invalidating the previous one
     token = generate_token()
+    if dealer_doc.get("auth_token_hash"):
+        _token_cache.pop(dealer_doc["auth_token_hash"], None)
     
-    # Update dealer
+    # Update dealer, storing only the token hash
     await db.dealers.update_one(
         {"phone": request.phone},
-        {"$set": {
-            "auth_token": token,
-            "otp": None,
-            "otp_expires_at": None
-        }}
+        {
+            "$set": {"auth_token_hash": hash_token(token)},
+            "$unset": {"auth_token": "", "otp": "", "otp_expires_at": ""}
+        }
     )
     
     dealer_doc["auth_token"] = token
-    if 'created_at' in dealer_doc and isinstance(dealer_doc['created_at'], str):
-        dealer_doc['created_at'] = datetime.fromisoformat(dealer_doc['created_at'])
     
     dealer = Dealer(**dealer_doc)
     
@@ -296,10 +362,6 @@ async def get_products():
     """Get all products"""
     products = await db.products.find({}, {"_id": 0}).to_list(1000)
     
-    for product in products:
-        if isinstance(product.get('created_at'), str):
-            product['created_at'] = datetime.fromisoformat(product['created_at'])
-    
     return products
 
 @api_router.get("/products/{product_id}", response_model=Product)
@@ -310,40 +372,40 @@ async def get_product(product_id: str):
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    if isinstance(product.get('created_at'), str):
-        product['created_at'] = datetime.fromisoformat(product['created_at'])
-    
-    return Product(**product)
+    return product
 
 # ============= CART ROUTES =============
 
 @api_router.get("/cart", response_model=List[CartItemWithProduct])
 async def get_cart(dealer: Dealer = Depends(get_current_dealer)):
     """Get dealer's cart"""
-    cart_items = await db.cart_items.find({"dealer_id": dealer.id}, {"_id": 0}).to_list(1000)
-    
-    result = []
-    for item in cart_items:
-        product = await db.products.find_one({"id": item["product_id"]}, {"_id": 0})
-        if product:
-            if isinstance(product.get('created_at'), str):
-                product['created_at'] = datetime.fromisoformat(product['created_at'])
-            product_obj = Product(**product)
-            subtotal = product_obj.price * item["quantity"]
-            result.append(CartItemWithProduct(
-                id=item["id"],
-                product=product_obj,
-                quantity=item["quantity"],
-                subtotal=subtotal
-            ))
-    
-    return result
+    # Join cart items with their products in a single round-trip
+    pipeline = [
+        {"$match": {"dealer_id": dealer.id}},
+        {"$lookup": {
+            "from": "products",
+            "localField": "product_id",
+            "foreignField": "id",
+            "as": "product"
+        }},
+        {"$unwind": "$product"},
+        {"$project": {
+            "_id": 0,
+            "id": 1,
+            "quantity": 1,
+            "product": 1,
+            "subtotal": {"$multiply": ["$product.price", "$quantity"]}
+        }}
+    ]
+    rows = await db.cart_items.aggregate(pipeline).to_list(1000)
+    
+    return rows
 
 @api_router.post("/cart", response_model=CartItem)
 async def add_to_cart(item_data: CartItemCreate, dealer: Dealer = Depends(get_current_dealer)):
     """Add item to cart"""
     # Check if product exists
-    product = await db.products.find_one({"id": item_data.product_id})
+    product = await db.products.find_one({"id": item_data.product_id}, {"_id": 1})
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
@@ -351,7 +413,7 @@ async def add_to_cart(item_data: CartItemCreate, dealer: Dealer = Depends(get_cu
     existing = await db.cart_items.find_one({
         "dealer_id": dealer.id,
         "product_id": item_data.product_id
-    })
+    }, {"_id": 0})
     
     if existing:
         # Update quantity
@@ -361,9 +423,7 @@ async def add_to_cart(item_data: CartItemCreate, dealer: Dealer = Depends(get_cu
             {"$set": {"quantity": new_quantity}}
         )
         existing["quantity"] = new_quantity
-        if isinstance(existing.get('created_at'), str):
-            existing['created_at'] = datetime.fromisoformat(existing['created_at'])
-        return CartItem(**existing)
+        return existing
     
     # Create new cart item
     cart_item = CartItem(
@@ -373,7 +433,6 @@ async def add_to_cart(item_data: CartItemCreate, dealer: Dealer = Depends(get_cu
     )
     
     doc = cart_item.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     
     await db.cart_items.insert_one(doc)
     return cart_item
@@ -415,66 +474,88 @@ async def clear_cart(dealer: Dealer = Depends(get_current_dealer)):
 @api_router.post("/orders", response_model=Order)
 async def create_order(order_data: OrderCreate, dealer: Dealer = Depends(get_current_dealer)):
     """Create order from cart"""
-    # Get cart items
-    cart_items = await db.cart_items.find({"dealer_id": dealer.id}, {"_id": 0}).to_list(1000)
+    # Get cart items joined with product data in a single round-trip
+    pipeline = [
+        {"$match": {"dealer_id": dealer.id}},
+        {"$lookup": {
+            "from": "products",
+            "localField": "product_id",
+            "foreignField": "id",
+            "as": "p"
+        }},
+        {"$unwind": "$p"},
+        {"$project": {
+            "_id": 0,
+            "product_id": "$p.id",
+            "product_name": "$p.name",
+            "price": "$p.price",
+            "quantity": 1,
+            "subtotal": {"$multiply": ["$p.price", "$quantity"]}
+        }}
+    ]
+    rows = await db.cart_items.aggregate(pipeline).to_list(1000)
     
-    if not cart_items:
+    if not rows:
         raise HTTPException(status_code=400, detail="Cart is empty")
     
     # Build order items
-    order_items = []
-    total_amount = 0.0
-    
-    for item in cart_items:
-        product = await db.products.find_one({"id": item["product_id"]}, {"_id": 0})
-        if product:
-            subtotal = product["price"] * item["quantity"]
-            order_items.append(OrderItem(
-                product_id=product["id"],
-                product_name=product["name"],
-                quantity=item["quantity"],
-                price=product["price"],
-                subtotal=subtotal
-            ))
-            total_amount += subtotal
-    
-    # Check credit limit for account payment
+    order_items = [OrderItem(**row) for row in rows]
+    total_amount = sum(item.subtotal for item in order_items)
+    
+    # Atomically check credit limit and reserve it for account payment
     if order_data.payment_method == PaymentMethod.ACCOUNT:
-        available_credit = dealer.credit_limit - dealer.outstanding_balance
-        if total_amount > available_credit:
+        updated = await db.dealers.find_one_and_update(
+            {
+                "id": dealer.id,
+                "$expr": {"$lte": [{"$add": ["$outstanding_balance", total_amount]}, "$credit_limit"]}
+            },
+            {"$inc": {"outstanding_balance": total_amount}},
+            projection={"_id": 0, "outstanding_balance": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        # Cached dealer now has a stale balance
+        _token_cache.pop(hash_token(dealer.auth_token), None)
+        
+        if updated is None:
+            current = await db.dealers.find_one(
+                {"id": dealer.id},
+                {"_id": 0, "credit_limit": 1, "outstanding_balance": 1}
+            ) or {}
+            available_credit = (
+                current.get("credit_limit", dealer.credit_limit)
+                - current.get("outstanding_balance", dealer.outstanding_balance)
+            )
             raise HTTPException(
                 status_code=400,
                 detail=f"Insufficient credit. Available: ₹{available_credit:.2f}, Required: ₹{total_amount:.2f}"
             )
     
-    # Create order
-    order = Order(
-        order_number=generate_order_number(),
-        dealer_id=dealer.id,
-        items=order_items,
-        total_amount=total_amount,
-        payment_method=order_data.payment_method,
-        payment_status=PaymentStatus.PENDING if order_data.payment_method == PaymentMethod.COD else PaymentStatus.COMPLETED,
-        delivery_address=order_data.delivery_address,
-        notes=order_data.notes
-    )
-    
-    doc = order.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['updated_at'] = doc['updated_at'].isoformat()
-    doc['items'] = [item.model_dump() for item in order_items]
-    
-    await db.orders.insert_one(doc)
-    
-    # Update outstanding balance for account payment
-    if order_data.payment_method == PaymentMethod.ACCOUNT:
-        new_balance = dealer.outstanding_balance + total_amount
-        await db.dealers.update_one(
-            {"id": dealer.id},
-            {"$set": {"outstanding_balance": new_balance}}
+    try:
+        # Create order
+        order = Order(
+            order_number=generate_order_number(),
+            dealer_id=dealer.id,
+            items=order_items,
+            total_amount=total_amount,
+            payment_method=order_data.payment_method,
+            payment_status=PaymentStatus.PENDING if order_data.payment_method == PaymentMethod.COD else PaymentStatus.COMPLETED,
+            delivery_address=order_data.delivery_address,
+            notes=order_data.notes
         )
+        
+        doc = order.model_dump()
+        
+        await db.orders.insert_one(doc)
+    except Exception:
+        # Release the reserved credit if the order was not saved
+        if order_data.payment_method == PaymentMethod.ACCOUNT:
+            await db.dealers.update_one(
+                {"id": dealer.id},
+                {"$inc": {"outstanding_balance": -total_amount}}
+            )
+        raise
     
-    # Clear cart
+    # Clear cart only once the order is saved
     await db.cart_items.delete_many({"dealer_id": dealer.id})
     
     return order
@@ -484,12 +565,6 @@ async def get_orders(dealer: Dealer = Depends(get_current_dealer)):
     """Get dealer's orders"""
     orders = await db.orders.find({"dealer_id": dealer.id}, {"_id": 0}).sort("created_at", -1).to_list(1000)
     
-    for order in orders:
-        if isinstance(order.get('created_at'), str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
-        if isinstance(order.get('updated_at'), str):
-            order['updated_at'] = datetime.fromisoformat(order['updated_at'])
-    
     return orders
 
 @api_router.get("/orders/{order_id}", response_model=Order)
@@ -500,33 +575,34 @@ async def get_order(order_id: str, dealer: Dealer = Depends(get_current_dealer))
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    if isinstance(order.get('created_at'), str):
-        order['created_at'] = datetime.fromisoformat(order['created_at'])
-    if isinstance(order.get('updated_at'), str):
-        order['updated_at'] = datetime.fromisoformat(order['updated_at'])
-    
-    return Order(**order)
+    return order
 
 # ============= DASHBOARD ROUTES =============
 
 @api_router.get("/dashboard/stats", response_model=DashboardStats)
 async def get_dashboard_stats(dealer: Dealer = Depends(get_current_dealer)):
     """Get dashboard statistics"""
-    # Get all orders
-    orders = await db.orders.find({"dealer_id": dealer.id}, {"_id": 0}).to_list(1000)
-    
-    total_orders = len(orders)
-    pending_orders = len([o for o in orders if o["order_status"] == OrderStatus.PENDING])
-    delivered_orders = len([o for o in orders if o["order_status"] == OrderStatus.DELIVERED])
-    total_spent = sum(o["total_amount"] for o in orders)
+    # Aggregate order stats server-side
+    pipeline = [
+        {"$match": {"dealer_id": dealer.id}},
+        {"$group": {
+            "_id": None,
+            "total_orders": {"$sum": 1},
+            "pending_orders": {"$sum": {"$cond": [{"$eq": ["$order_status", OrderStatus.PENDING.value]}, 1, 0]}},
+            "delivered_orders": {"$sum": {"$cond": [{"$eq": ["$order_status", OrderStatus.DELIVERED.value]}, 1, 0]}},
+            "total_spent": {"$sum": "$total_amount"}
+        }}
+    ]
+    rows = await db.orders.aggregate(pipeline).to_list(1)
+    stats = rows[0] if rows else {}
     
     credit_available = dealer.credit_limit - dealer.outstanding_balance
     
     return DashboardStats(
-        total_orders=total_orders,
-        pending_orders=pending_orders,
-        delivered_orders=delivered_orders,
-        total_spent=total_spent,
+        total_orders=stats.get("total_orders", 0),
+        pending_orders=stats.get("pending_orders", 0),
+        delivered_orders=stats.get("delivered_orders", 0),
+        total_spent=stats.get("total_spent", 0.0),
         credit_available=credit_available,
         outstanding_balance=dealer.outstanding_balance
     )
@@ -540,26 +616,21 @@ async def chat(message: ChatMessage, dealer: Dealer = Depends(get_current_dealer
         # Get API key from environment
         api_key = os.environ.get('EMERGENT_LLM_KEY')
         
-        # Get dealer's recent orders for context
-        recent_orders = await db.orders.find(
-            {"dealer_id": dealer.id}, 
-            {"_id": 0}
-        ).sort("created_at", -1).limit(5).to_list(5)
-        
-        # Get all products for context
-        products = await db.products.find({}, {"_id": 0}).to_list(100)
+        # Get dealer's recent orders and the product catalog concurrently
+        recent_orders, products_info = await asyncio.gather(
+            db.orders.find(
+                {"dealer_id": dealer.id},
+                {"_id": 0, "order_number": 1, "total_amount": 1, "order_status": 1}
+            ).sort("created_at", -1).limit(3).to_list(3),
+            get_products_info()
+        )
         
         # Build context
-        products_info = "\n".join([
-            f"- {p['name']}: ₹{p['price']} per {p['packaging']} (Grade: {p['grade']}, Stock: {p['stock']})"
-            for p in products
-        ])
-        
         orders_info = ""
         if recent_orders:
             orders_info = "Recent orders:\n" + "\n".join([
                 f"- Order {o['order_number']}: ₹{o['total_amount']}, Status: {o['order_status']}"
-                for o in recent_orders[:3]
+                for o in recent_orders
             ])
         
         # Create system message with context
@@ -607,11 +678,7 @@ Be helpful, professional, and provide accurate information based on the context
 @api_router.post("/seed-data")
 async def seed_data():
     """Seed database with sample products"""
-    # Check if products already exist
-    existing = await db.products.count_documents({})
-    if existing > 0:
-        return {"message": "Products already exist"}
-    
+    global _catalog_cache
     products = [
         {
             "id": str(uuid.uuid4()),
@@ -628,7 +695,7 @@ async def seed_data():
                 "setting_time": "30 min - 10 hours",
                 "fineness": "225 m2/kg"
             },
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -645,7 +712,7 @@ async def seed_data():
                 "setting_time": "30 min - 10 hours",
                 "fineness": "225 m2/kg"
             },
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -662,7 +729,7 @@ async def seed_data():
                 "setting_time": "30 min - 10 hours",
                 "fineness": "300 m2/kg"
             },
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -679,7 +746,7 @@ async def seed_data():
                 "setting_time": "30 min - 10 hours",
                 "fineness": "325 m2/kg"
             },
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -696,7 +763,7 @@ async def seed_data():
                 "setting_time": "30 min - 10 hours",
                 "fineness": "225 m2/kg"
             },
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -713,12 +780,35 @@ async def seed_data():
                 "setting_time": "30 min - 10 hours",
                 "fineness": "225 m2/kg"
             },
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
     ]
     
-    await db.products.insert_many(products)
-    return {"message": f"{len(products)} products added successfully"}
+    # Upsert by name + packaging so re-seeding never duplicates products
+    ops = [
+        UpdateOne(
+            {"name": p["name"], "packaging": p["packaging"]},
+            {"$setOnInsert": p},
+            upsert=True
+        )
+        for p in products
+    ]
+    try:
+        result = await db.products.bulk_write(ops, ordered=False)
+        upserted_count = result.upserted_count
+    except BulkWriteError as e:
+        # A concurrent seed inserted some products first; treat those as present
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+        upserted_count = e.details.get("nUpserted", 0)
+    
+    if upserted_count == 0:
+        return {"message": "Products already exist"}
+    
+    # Rebuild the chat catalog on next use
+    _catalog_cache = None
+    
+    return {"message": f"{upserted_count} products added successfully"}
 
 # ============= ROOT ROUTES =============
 
@@ -737,6 +827,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+@app.on_event("startup")
+async def create_indexes():
+    """Create indexes used by the hot query paths"""
+    await db.dealers.create_index("phone", unique=True)
+    await db.dealers.create_index("auth_token_hash")
+    await db.dealers.create_index(
+        [("phone", 1), ("otp", 1)],
+        partialFilterExpression={"otp": {"$exists": True}}
+    )
+    await db.dealers.create_index("id", unique=True)
+    await db.products.create_index("id", unique=True)
+    await db.products.create_index([("name", 1), ("packaging", 1)], unique=True)
+    await db.cart_items.create_index([("dealer_id", 1), ("product_id", 1)])
+    await db.orders.create_index("order_number", unique=True)
+    await db.orders.create_index([("dealer_id", 1), ("created_at", -1)])
+    await db.orders.create_index([("dealer_id", 1), ("order_status", 1)])
+    await db.dealers.create_index(
+        "otp_expires_at",
+        partialFilterExpression={"otp_expires_at": {"$exists": True}}
+    )
+
+async def clear_expired_otps():
+    """Periodically unset expired OTP fields on dealers"""
+    while True:
+        try:
+            # Also reap legacy shapes: null fields left by the old verify_otp and
+            # ISO-string expiries, which verify_otp can no longer match
+            result = await db.dealers.update_many(
+                {"$or": [
+                    {"otp_expires_at": {"$lt": datetime.now(timezone.utc)}},
+                    {"otp_expires_at": {"$type": ["null", "string"]}}
+                ]},
+                {"$unset": {"otp": "", "otp_expires_at": ""}}
+            )
+            if result.modified_count:
+                logger.info(f"Cleared {result.modified_count} expired OTPs")
+        except Exception as e:
+            logger.error(f"OTP cleanup error: {str(e)}")
+        await asyncio.sleep(OTP_CLEANUP_INTERVAL)
+
+@app.on_event("startup")
+async def start_otp_cleanup():
+    global _otp_cleanup_task
+    _otp_cleanup_task = asyncio.create_task(clear_expired_otps())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if _otp_cleanup_task:
+        _otp_cleanup_task.cancel()
     client.close()